@@ -5,6 +5,15 @@ import sys
 
 NAMESPACE='http://vamdc.org/xml/xsams/1.0'
 
+# Namespace qualified tags and paths of XSAMS elements. They are built (and interned)
+# only once instead of each time an element is processed.
+NS = intern('{%s}' % NAMESPACE)
+TAG_X = intern(NS + 'X')
+TAG_Y = intern(NS + 'Y')
+TAG_COMMENTS = intern(NS + 'Comments')
+PATH_X_DATALIST = intern(TAG_X + '/' + NS + 'DataList')
+PATH_Y_DATALIST = intern(TAG_Y + '/' + NS + 'DataList')
+
 # some usefull functions
 def split_datalist(datalist):
     """
@@ -36,11 +45,11 @@ def convert_tabulateddata(item):
     comment = (string)
     """
     
-    x = item.find("{%s}X/{%s}DataList" % (NAMESPACE, NAMESPACE) ).text.split(" ")
-    y = item.find("{%s}Y/{%s}DataList" % (NAMESPACE, NAMESPACE) ).text.split(" ")
-    xunits = item.find("{%s}X" % (NAMESPACE) ).get('units')
-    yunits = item.find("{%s}Y" % (NAMESPACE) ).get('units')
-    comment = item.find("{%s}Comments" % (NAMESPACE)).text
+    x = item.find(PATH_X_DATALIST).text.split(" ")
+    y = item.find(PATH_Y_DATALIST).text.split(" ")
+    xunits = item.find(TAG_X).get('units')
+    yunits = item.find(TAG_Y).get('units')
+    comment = item.find(TAG_COMMENTS).text
     
     datadict = {}
     for i in range(len(x)):
@@ -211,6 +220,8 @@ def _construct_dictmodelclass(model_definitions, module):
         def __init__(self, xml):
             dict.__init__(self)
             self.xml = xml
+            if self.xml is None:
+                return
             for item in eval("%s" % self.DICT[model_definitions['Name']]):
                 element = module.__dict__[model_definitions['Type']](item)
                 self[element.Id] = element
@@ -258,3 +269,37 @@ def register_models(DICT_MODELS, module):
         setattr(module, model['Name'], _construct_dictmodelclass(model, module))
         
 
+
+def _iselement(value):
+    """
+    Returns True if value is an element of an XML document (xml.etree or lxml)
+    """
+    return hasattr(value, 'tag') and hasattr(value, 'attrib')
+
+def release_xml(item, _seen = None):
+    """
+    Removes the references to the elements of the XML document from item (a model,
+    a dictionary class or a list or dictionary of models) and from all models it
+    contains, so that the memory of the document can be freed. Fields which still
+    contain elements of the document (e.g. __qnelements__) are set to None.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(item) in _seen:
+        return
+    _seen.add(id(item))
+
+    if isinstance(item, dict):
+        for value in item.itervalues():
+            release_xml(value, _seen)
+    elif isinstance(item, (list, tuple)):
+        for value in item:
+            release_xml(value, _seen)
+
+    if isinstance(item, Model) or hasattr(item, 'DICT'):
+        item.xml = None
+        for field, value in item.__dict__.items():
+            if _iselement(value) or (isinstance(value, list) and any(_iselement(el) for el in value)):
+                setattr(item, field, None)
+            else:
+                release_xml(value, _seen)
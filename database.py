@@ -758,7 +758,7 @@ class Database(object):
 
                 vamdcspeciesid = row[2]
                 # Currently the database prefix XCDMS- or XJPL- has to be removed
-                speciesid = row[1].split("-")[1]
+                speciesid = row[1].partition("-")[2] or row[1]
                 query_string = "SELECT ALL WHERE SpeciesID=%s" % speciesid
                 request.setnode(node)
                 request.setquery(query_string)
@@ -6,6 +6,10 @@ from copy import deepcopy
 NAMESPACE='http://vamdc.org/xml/xsams/0.3'
 NSMAP = {'ns':NAMESPACE}
 
+# Namespace qualified tags which are compared with the tags of species elements
+_TAG_MOLECULE = intern('{%s}Molecule' % NAMESPACE)
+_TAG_ION = intern('{%s}Ion' % NAMESPACE)
+
 # Helper function to test if an object is a list or tuple
 isiterable = lambda obj: hasattr(obj, '__iter__')
 
@@ -140,7 +144,7 @@ def append_specie(xml, specie):
     else:
         species = species[0]
 
-    if specie.tag == '{%s}Molecule' % NSMAP['ns']:
+    if specie.tag == _TAG_MOLECULE:
 
         # Check if Processes - element exists:
         mols = xml.xpath('//ns:Molecules', namespaces=NSMAP)
@@ -156,7 +160,7 @@ def append_specie(xml, specie):
 
         append_element(mols, specie)
 
-    elif specie.tag == '{%s}Ion' % NSMAP['ns']:
+    elif specie.tag == _TAG_ION:
 
         atoms = xml.xpath('//ns:Atoms', namespaces=NSMAP)
         if len(atoms)==0:
@@ -35,7 +35,7 @@ class Query(object):
 
     def set_query(self, query):
 
-        if type(query)==QueryBuilder:
+        if isinstance(query, QueryBuilder):
             self.QueryBuilder=query
             self.Query = query.Query
 
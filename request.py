@@ -9,22 +9,173 @@ try:
     is_available_xml_objectify = True
 except ImportError:
     is_available_xml_objectify = False
- 
-from xml.etree import ElementTree
-import urllib2
+
+from urllib import urlencode
 
 from settings import *
 import query as q
 import results as r
 import nodes
 
-from urlparse import urlparse
 from httplib import HTTPConnection, HTTPSConnection, urlsplit, HTTPException, socket
 
 from dateutil.parser import parse
+from dateutil.tz import tzutc
+from email.utils import parsedate_tz, mktime_tz
+from datetime import datetime
+import threading
+import functools
+import inspect
+from collections import OrderedDict
+import os
+import ssl
+import zlib
+import hashlib
+import cPickle as pickle
+from cStringIO import StringIO
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from multiprocessing.pool import ThreadPool
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.packages.urllib3.util.retry import Retry
+    is_available_requests = True
+except ImportError:
+    is_available_requests = False
 
 XSD = "http://vamdc.org/xml/xsams/1.0"
 
+# Queries with longer querypaths are not retried with http-method GET, because
+# urls of this length are rejected by many servers
+MAX_GET_LENGTH = 4096
+
+# Headers which are used if the database node does not return statistics
+_ZERO_HEADERS = (("vamdc-count-species",0),
+                 ("vamdc-count-states",0),
+                 ("vamdc-truncated",0),
+                 ("vamdc-count-molecules",0),
+                 ("vamdc-count-sources",0),
+                 ("vamdc-approx-size",0),
+                 ("vamdc-count-radiative",0),
+                 ("vamdc-count-atoms",0))
+
+if is_available_requests:
+    # Session which is shared by all Request instances. It keeps the connections to the 
+    # database nodes alive and transparently decompresses gzip encoded responses.
+    # Threads wait for a free connection (pool_block) instead of opening additional connections
+    # which would be discarded afterwards, so that concurrent requests to one node are
+    # sent one after another via at most MAX_CONNECTIONS kept-alive connections.
+    _session = requests.Session()
+    _adapter = HTTPAdapter(pool_connections = 16,
+                           pool_maxsize = MAX_CONNECTIONS,
+                           pool_block = True,
+                           max_retries = Retry(total = 3, connect = 3, read = 0, backoff_factor = 0.5))
+    _session.mount('http://', _adapter)
+    _session.mount('https://', _adapter)
+
+def _parsehttpdate(value):
+    """
+    Parses a HTTP-date (e.g. 'Tue, 15 Nov 1994 08:12:31 GMT') and returns a timezone aware
+    datetime instance. Dates in other formats are parsed with dateutil.
+    """
+    parsed = parsedate_tz(value)
+    if parsed is None or parsed[9] is None:
+        return parse(value)
+    return datetime.fromtimestamp(mktime_tz(parsed), tzutc())
+
+# Keep-alive connections to the database nodes which are used if the package 'requests'
+# is not available. Connections are kept per thread
+# (http connections must not be shared between threads) and are keyed by (scheme, netloc)
+_local = threading.local()
+
+# SSL contexts which are shared by all https connections (see Request.verifyhttps)
+_CTX_VERIFY = ssl.create_default_context()
+_CTX_NOVERIFY = ssl._create_unverified_context()
+
+def _getconnection(urlobj, timeout, verifyhttps = True):
+    """
+    Returns a cached connection to the host specified in urlobj. A new
+    connection is created if no connection to this host is available yet.
+    """
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+
+    key = (urlobj.scheme, urlobj.netloc, verifyhttps)
+    try:
+        conn = _local.connections[key]
+    except KeyError:
+        if urlobj.scheme == 'https':
+            if verifyhttps:
+                context = _CTX_VERIFY
+            else:
+                context = _CTX_NOVERIFY
+            conn = HTTPSConnection(urlobj.netloc, timeout = timeout, context = context)
+        else:
+            conn = HTTPConnection(urlobj.netloc, timeout = timeout)
+        _local.connections[key] = conn
+
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn
+
+def _closeconnection(urlobj, verifyhttps = True):
+    """
+    Closes the cached connection to the host specified in urlobj and removes it
+    from the cache.
+    """
+    key = (urlobj.scheme, urlobj.netloc, verifyhttps)
+    try:
+        _local.connections.pop(key).close()
+    except (AttributeError, KeyError):
+        pass
+
+class _GzipStream(object):
+    """
+    File-like object which decompresses the gzip encoded body of a response while it is read.
+    """
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.buffer = ''
+        self.eof = False
+
+    def read(self, size = -1):
+        if size < 0:
+            data = [self.buffer]
+            if not self.eof:
+                for chunk in iter(lambda: self.fileobj.read(r.BLOCKSIZE), ''):
+                    data.append(self.decompressor.decompress(chunk))
+                data.append(self.decompressor.flush())
+                self.eof = True
+            self.buffer = ''
+            return ''.join(data)
+
+        while len(self.buffer) < size and not self.eof:
+            chunk = self.fileobj.read(max(size, r.BLOCKSIZE))
+            if chunk:
+                self.buffer += self.decompressor.decompress(chunk)
+            else:
+                self.buffer += self.decompressor.flush()
+                self.eof = True
+        data = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return data
+
+    def close(self):
+        self.fileobj.close()
+
+def _readbody(body):
+    """
+    Reads the complete body of a response in blocks of results.BLOCKSIZE bytes
+    """
+    return ''.join(iter(lambda: body.read(r.BLOCKSIZE), ''))
+
 class TimeOutError(HTTPException):
     def __init__(self):
         HTTPException.__init__(self, 408, "Timeout")
@@ -39,15 +190,25 @@ class Request(object):
     """
     A Request instance represents one request to a specified VAMDC database node. 
     """
-    def __init__(self, node = None, query = None):
+    def __init__(self, node = None, query = None, cache = False, verifyhttps = True):
         """
         Initialize a request instance. 
 
         node: Database-Node to which the request will be sent
         query: Query which will be performed on the database.
+        cache: If True, responses are cached in CACHE_DIR (see settings.py) and are only
+               downloaded again if the document has been modified. Only responses with a
+               'last-modified' or 'etag' header are cached, because other responses can not
+               be revalidated. Cached responses are read completely into memory, also if
+               they are parsed with dorequest(stream = True).
+        verifyhttps: If False, certificates of https - nodes are not verified.
         """
         self.status = 0
         self.reason = "INIT"
+        self.cache = cache
+        self.verifyhttps = verifyhttps
+        self.__url = None
+        self.__lastmodified = {}
 
         if node != None:
             self.setnode(node)
@@ -64,7 +225,7 @@ class Request(object):
         self.status = 0
         self.reason = "INIT"
 
-        if type(node) == nodes.Node:
+        if isinstance(node, nodes.Node):
             self.node = node
             
             if not hasattr(self.node,'url') or len(self.node.url)==0:
@@ -76,6 +237,7 @@ class Request(object):
                     self.baseurl+='sync?'
                 else:
                     self.baseurl+='/sync?'
+                self.__url = None
 
     def setbaseurl(self, baseurl):
         """
@@ -88,6 +250,7 @@ class Request(object):
             self.baseurl+='sync?'
         else:
             self.baseurl+='/sync?'
+        self.__url = None
 
     def setquery(self, query):
         """
@@ -97,10 +260,10 @@ class Request(object):
         self.status = 0
         self.reason = "INIT"
         
-        if type(query)==q.Query:
+        if isinstance(query, q.Query):
             self.query = query
             self.__setquerypath()
-        elif type(query) == str or type(query) == unicode:
+        elif isinstance(query, basestring):
             self.query = q.Query(Query = query)
             self.__setquerypath()
         else:
@@ -113,63 +276,270 @@ class Request(object):
         """
         Sets the querypath which is appended to the nodes 'base'-url.
         """
-        self.querypath = "REQUEST=%s&LANG=%s&FORMAT=%s&QUERY=%s" % ( self.query.Request,
-                                                                     self.query.Lang,
-                                                                     self.query.Format,
-                                                                     urllib2.quote(self.query.Query))
-        
+        self.querypath = urlencode([('REQUEST', self.query.Request),
+                                    ('LANG', self.query.Lang),
+                                    ('FORMAT', self.query.Format),
+                                    ('QUERY', self.query.Query)])
+        self.__url = None
+
+    def __geturl(self):
+        """
+        Returns the tuple (url, urlobj) with the url of the request and the url split into its
+        components. It is only built again if the node or the query have been changed.
+        """
+        if self.__url is None:
+            url = self.baseurl + self.querypath
+            self.__url = (url, urlsplit(url))
+        return self.__url
+
+    def __getcachefile(self):
+        """
+        Returns the name of the file in which the response to this request is cached.
+        """
+        key = hashlib.sha1(self.__geturl()[0]).hexdigest()
+        return os.path.join(os.path.expanduser(CACHE_DIR), "%s.bin" % key)
+
+    def __readcache(self):
+        """
+        Returns the cached response ({'headers':..., 'body':...}) of this request or None if it
+        has not been cached yet.
+        """
+        filename = self.__getcachefile()
+        try:
+            with open(filename, 'rb') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def __writecache(self, headers, body):
+        """
+        Stores the response of this request in the cache.
+        """
+        filename = self.__getcachefile()
+        try:
+            if not os.path.isdir(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+            # the file is truncated after the lock has been acquired
+            with open(filename, 'ab') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.truncate(0)
+                pickle.dump({'headers':dict(headers), 'body':body}, f, pickle.HIGHEST_PROTOCOL)
+        except (IOError, OSError), e:
+            print "Could not write cache file %s: %s" % (filename, e)
+
+    def __isvalid(self, cached, timeout):
+        """
+        Checks with a conditional HEAD request if the cached response is still valid, i.e. if
+        the document has not been modified since it has been cached.
+        """
+        requestheaders = {}
+        if 'last-modified' in cached['headers']:
+            requestheaders['If-Modified-Since'] = cached['headers']['last-modified']
+        if 'etag' in cached['headers']:
+            requestheaders['If-None-Match'] = cached['headers']['etag']
+        if len(requestheaders) == 0:
+            # the response can not be revalidated
+            return False
+
+        status, reason, headers, body = self.__getresponse("HEAD", timeout, requestheaders)
+        body.read()
+
+        if status == 304:
+            return True
+        if status == 200:
+            headers = dict(headers)
+            for key in ('last-modified', 'etag'):
+                if key in cached['headers'] and headers.get(key) != cached['headers'][key]:
+                    return False
+            return True
+        return False
+
+    def __getresponse(self, HttpMethod, timeout, requestheaders = None):
+        """
+        Sends the request to the database node and returns the tuple (status, reason, headers, body).
+        body is a file-like object from which the content of the response can be read. It has
+        to be read completely before the connection can be reused for further requests.
+        The request is sent via the shared requests.Session if the package 'requests' is available and
+        via a (cached) keep-alive httplib connection otherwise.
+        requestheaders: additional headers which are sent with the request
+        POST requests send the query parameters in the body of the request instead of the url.
+        """
+        url, urlobj = self.__geturl()
+
+        if HttpMethod == 'POST':
+            path = urlobj.path
+            data = self.querypath
+        else:
+            path = urlobj.path+"?"+urlobj.query
+            data = None
+
+        if is_available_requests:
+            headers = {'Accept-Encoding':'gzip, deflate'}
+            if data is not None:
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+                url = "%s://%s%s" % (urlobj.scheme, urlobj.netloc, path)
+            if requestheaders is not None:
+                headers.update(requestheaders)
+            try:
+                res = _session.request(HttpMethod,
+                                       url,
+                                       data = data,
+                                       timeout = timeout,
+                                       stream = True,
+                                       verify = self.verifyhttps,
+                                       headers = headers)
+            except requests.Timeout:
+                self.status = 408
+                self.reason = "Socket timeout"
+                raise TimeOutError
+            # let urllib3 decompress the body while it is read
+            res.raw.decode_content = True
+            headers = [(key.lower(), value) for key, value in res.headers.items()]
+            return res.status_code, res.reason, headers, res.raw
+
+        for attempt in range(2):
+            conn = _getconnection(urlobj, timeout, self.verifyhttps)
+            try:
+                conn.putrequest(HttpMethod, path)
+                conn.putheader("Connection", "keep-alive")
+                conn.putheader("Accept-Encoding", "gzip")
+                if data is not None:
+                    conn.putheader("Content-Type", "application/x-www-form-urlencoded")
+                    conn.putheader("Content-Length", str(len(data)))
+                if requestheaders is not None:
+                    for key, value in requestheaders.items():
+                        conn.putheader(key, value)
+                conn.endheaders()
+                if data is not None:
+                    conn.send(data)
+                # buffered: status line and headers are not received byte by byte
+                res = conn.getresponse(buffering = True)
+                if res.getheader("content-encoding", "").lower() == "gzip":
+                    return res.status, res.reason, res.getheaders(), _GzipStream(res)
+                return res.status, res.reason, res.getheaders(), res
+            except socket.timeout:
+                # error handling has to be included
+                _closeconnection(urlobj, self.verifyhttps)
+                self.status = 408
+                self.reason = "Socket timeout"
+                raise TimeOutError
+            except (HTTPException, socket.error):
+                _closeconnection(urlobj, self.verifyhttps)
+                if attempt > 0:
+                    raise
+
+    def __abortresponse(self, body):
+        """
+        Closes a response which has not been read completely. Its connection can not be reused,
+        because the rest of the body would be received as response to the next request.
+        """
+        body.close()
+        if hasattr(body, 'release_conn'):
+            # requests: the closed connection is discarded by the pool
+            body.release_conn()
+        else:
+            _closeconnection(self.__geturl()[1], self.verifyhttps)
+
+    def __readbody(self, body):
+        """
+        Reads the complete body of a response (see _readbody). The response is aborted if
+        the body can not be read completely.
+        """
+        try:
+            return _readbody(body)
+        except:
+            self.__abortresponse(body)
+            raise
 
-    def dorequest(self, timeout = TIMEOUT, HttpMethod = "POST", parsexsams = True):
+    def dorequest(self, timeout = TIMEOUT, HttpMethod = "POST", parsexsams = True, stream = False, _retried = False):
         """
         Sends the request to the database node and returns a result.Result instance. The
-        request uses 'POST' requests by default. If the request fails or if stated in the parameter 'HttpMethod',
-        'GET' requests will be performed. 
+        request uses 'POST' requests by default, which send the query in the body of the request.
+        If the request fails or if stated in the parameter 'HttpMethod', 'GET' requests will be
+        performed. Failed requests are only retried with 'GET' if the querypath is not longer
+        than MAX_GET_LENGTH. 'GET' requests which are rejected because of the length of the url
+        (status 414) are retried with 'POST'. Each request is retried with the other http-method at most once.
         The returned result will be parsed by default and the model defined in 'specmodel' will be populated by default 
         (parseexams = True).
+        If stream is True, the document is parsed while it is downloaded and elements are discarded as soon as
+        they have been added to the model. Less memory is needed for large documents, but the XSAMS document
+        is not available in the result (result.Xml is None). If the request is cached (see __init__), the
+        document is buffered completely in order to be written to the cache.
         """
         self.xml = None
         #self.get_xml(self.Source.Requesturl)
-        url = self.baseurl + self.querypath
-        urlobj = urlsplit(url)
-        
-        if urlobj.scheme == 'https':
-            conn = HTTPSConnection(urlobj.netloc, timeout = timeout)
-        else:
-            conn = HTTPConnection(urlobj.netloc, timeout = timeout)
-        conn.putrequest(HttpMethod, urlobj.path+"?"+urlobj.query)
-        conn.endheaders()
-        
-        try:
-            res = conn.getresponse()
-        except socket.timeout:
-            # error handling has to be included
-            self.status = 408
-            self.reason = "Socket timeout"
-            raise TimeOutError
 
-        self.status = res.status
-        self.reason = res.reason
+        # the document could have been modified since its date has been requested
+        self.__lastmodified.pop(self.__geturl()[0], None)
+
+        if self.cache:
+            cached = self.__readcache()
+        else:
+            cached = None
+
+        if cached is not None and self.__isvalid(cached, timeout):
+            # Document has not been modified -> use the cached response
+            self.status = 200
+            self.reason = "OK (cached)"
+            self.headers = dict(cached['headers'])
+            body = StringIO(cached['body'])
+        else:
+            self.status, self.reason, headers, body = self.__getresponse(HttpMethod, timeout)
+            if self.status == 200:
+                self.headers = dict(headers)
+            if self.status == 200 and self.cache and ('last-modified' in self.headers or 'etag' in self.headers):
+                content = self.__readbody(body)
+                self.__writecache(headers, content)
+                body = StringIO(content)
 
         if not parsexsams:
-            if res.status == 200:
+            if self.status == 200:
                 result = r.Result()
-                result.Content = res.read()
-            elif res.status == 400 and HttpMethod == 'POST':
+                result.Content = self.__readbody(body)
+            elif self.status == 400 and HttpMethod == 'POST' and not _retried and len(self.querypath) <= MAX_GET_LENGTH:
                 # Try to use http-method: GET
-                result = self.dorequest( HttpMethod = 'GET', parsexsams = parsexsams)
+                body.read()
+                result = self.dorequest(timeout = timeout, HttpMethod = 'GET', parsexsams = parsexsams, stream = stream, _retried = True)
+            elif self.status == 414 and HttpMethod != 'POST' and not _retried:
+                # Url is too long, send the query in the body of a POST request
+                body.read()
+                result = self.dorequest(timeout = timeout, HttpMethod = 'POST', parsexsams = parsexsams, stream = stream, _retried = True)
             else:
+                body.read()
                 result = None
         else:
-            if res.status == 200:
-                self.xml = res.read()
+            if self.status == 200 and stream:
+                result = r.Result()
+                events = r.iterparse_xsams(body)
+                try:
+                    result.parse_stream(events)
+                    # read what is left after the closing tag of the document
+                    body.read()
+                except:
+                    # stop the parser (and its reader) before the connection is closed
+                    if hasattr(events, 'close'):
+                        events.close()
+                    self.__abortresponse(body)
+                    raise
+            elif self.status == 200:
+                self.xml = self.__readbody(body)
 
                 result = r.Result()
                 result.Xml = self.xml
                 result.populate_model()
-            elif res.status == 400 and HttpMethod == 'POST':
+            elif self.status == 400 and HttpMethod == 'POST' and not _retried and len(self.querypath) <= MAX_GET_LENGTH:
                 # Try to use http-method: GET
-                result = self.dorequest( HttpMethod = 'GET', parsexsams = parsexsams)
+                body.read()
+                result = self.dorequest(timeout = timeout, HttpMethod = 'GET', parsexsams = parsexsams, stream = stream, _retried = True)
+            elif self.status == 414 and HttpMethod != 'POST' and not _retried:
+                # Url is too long, send the query in the body of a POST request
+                body.read()
+                result = self.dorequest(timeout = timeout, HttpMethod = 'POST', parsexsams = parsexsams, stream = stream, _retried = True)
             else:
+                body.read()
                 result = None
 
         return result
@@ -182,72 +552,39 @@ class Request(object):
 
         self.headers = {}
 
-        url = self.baseurl + self.querypath
-        urlobj = urlsplit(url)
-       
-        if urlobj.scheme == 'https':
-            conn = HTTPSConnection(urlobj.netloc, timeout = timeout)
-        else:
-            conn = HTTPConnection(urlobj.netloc, timeout = timeout)
-        conn.putrequest("HEAD", urlobj.path+"?"+urlobj.query)
-        conn.endheaders()
-        
-        try:
-            res = conn.getresponse()
-        except socket.timeout, e:
-            self.status = 408
-            self.reason = "Socket timeout"
-            raise TimeOutError
-
-        self.status = res.status
-        self.reason = res.reason
-
-        if res.status == 200:
-            headers = res.getheaders()
-        elif res.status == 204:
-            headers = [ ("vamdc-count-species",0),
-                            ("vamdc-count-states",0),
-                            ("vamdc-truncated",0),
-                            ("vamdc-count-molecules",0),
-                            ("vamdc-count-sources",0),
-                            ("vamdc-approx-size",0),
-                            ("vamdc-count-radiative",0),
-                            ("vamdc-count-atoms",0)]
-        elif res.status == 408:
+        self.status, self.reason, headers, body = self.__getresponse("HEAD", timeout)
+        body.read()
+
+        if self.status == 204:
+            headers = _ZERO_HEADERS
+        elif self.status == 408:
             print "TIMEOUT"
-            headers =  [("vamdc-count-species",0),
-                            ("vamdc-count-states",0),
-                            ("vamdc-truncated",0),
-                            ("vamdc-count-molecules",0),
-                            ("vamdc-count-sources",0),
-                            ("vamdc-approx-size",0),
-                            ("vamdc-count-radiative",0),
-                            ("vamdc-count-atoms",0)]            
-        else:
-            print "STATUS: %d" % res.status
-            headers =  [("vamdc-count-species",0),
-                            ("vamdc-count-states",0),
-                            ("vamdc-truncated",0),
-                            ("vamdc-count-molecules",0),
-                            ("vamdc-count-sources",0),
-                            ("vamdc-approx-size",0),
-                            ("vamdc-count-radiative",0),
-                            ("vamdc-count-atoms",0)]
-
-        for key,value in headers:
-            self.headers[key] = value
+            headers = _ZERO_HEADERS
+        elif self.status != 200:
+            print "STATUS: %d" % self.status
+            headers = _ZERO_HEADERS
+
+        self.headers = dict(headers)
  
     def getlastmodified(self):
         """
         Returns the 'last-modified' date which has been specified in the
-        Header of the requested document.
+        Header of the requested document. The date is only requested once
+        for each url until the document is requested again (see dorequest).
         """
-        if not self.status == 200:
+        url = self.__geturl()[0]
+        if url in self.__lastmodified:
+            self.lastmodified = self.__lastmodified[url]
+            return self.lastmodified
+
+        # The headers are also available if the document has been requested already
+        if not self.status == 200 or not hasattr(self, 'headers'):
             self.doheadrequest()
 
         if self.headers.has_key('last-modified'):
             try:
-                self.lastmodified = parse(self.headers['last-modified'])
+                self.lastmodified = _parsehttpdate(self.headers['last-modified'])
+                self.__lastmodified[url] = self.lastmodified
             except Exception, e:
                 print "Could not parse date %s" % self.headers['last-modified']
                 print e
@@ -273,4 +610,216 @@ class Request(object):
         return result
 
 
+def _cached(maxsize = 64, normalize = None):
+    """
+    Decorator which keeps the results of the module functions (e.g. getspecies) in memory, so that
+    repeated requests are neither sent nor parsed again. Only the parsed data (result.Result.data) is
+    kept: the cache stores a copy of the result without the XSAMS document (see result.Result.discard_xml),
+    which is returned by later calls. Results are cached per node and arguments.
+    Calls with a Request instance (parameter 'request') are not cached, because the result depends
+    on this instance (e.g. on its base url). At most maxsize results are kept, the least recently used
+    result is removed first. The cache of a function is cleared with <function>.cache_clear().
+
+    normalize: dictionary with the names of arguments as keys and functions as values, which convert
+               equivalent values of the argument (e.g. 149 and 'XCDMS-149') into the same key.
+    """
+    def decorator(function):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(function)
+        def wrapper(node, *args, **kwargs):
+            # positional and keyword arguments give the same key
+            callargs = inspect.getcallargs(function, node, *args, **kwargs)
+            if callargs.pop('request', None) is not None:
+                return function(node, *args, **kwargs)
+            del callargs['node']
+            if normalize is not None:
+                for name, convert in normalize.items():
+                    callargs[name] = convert(callargs[name])
+
+            if isinstance(node, nodes.Node):
+                key = (node.identifier, node.url) + tuple(sorted(callargs.items()))
+            else:
+                key = (node,) + tuple(sorted(callargs.items()))
+
+            with lock:
+                if key in cache:
+                    # move the result to the end of the list of recently used results
+                    result = cache.pop(key)
+                    cache[key] = result
+                    return result
+
+            result = function(node, *args, **kwargs)
+            # failed requests are not cached
+            if result is not None:
+                cached = r.Result(source = result.Source)
+                cached.data = result.data
+                cached.discard_xml()
+                with lock:
+                    cache[key] = cached
+                    if len(cache) > maxsize:
+                        cache.popitem(last = False)
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+# List of the registered nodes which is used to resolve node names. It is
+# only retrieved once from the registry
+_nodelist = None
+
+def _resolvenode(node):
+    """
+    Returns the nodes.Node instance for node, which could be either a nodes.Node
+    instance or a string which identifies the node (see nodes.Nodelist.findnode).
+    """
+    global _nodelist
+
+    if isinstance(node, nodes.Node):
+        return node
+    if _nodelist is None:
+        _nodelist = nodes.Nodelist()
+    return _nodelist.findnode(node)
+
+def _getrequest(node):
+    """
+    Returns a Request instance for node. The instances are reused by the module
+    functions (e.g. gettransitions) and are kept per thread and node url. The
+    functions have to release the document of the last request (see _releaserequest).
+    """
+    node = _resolvenode(node)
+    if not hasattr(_local, 'requests'):
+        _local.requests = {}
+
+    try:
+        request = _local.requests[node.url]
+    except KeyError:
+        request = Request(node = node)
+        _local.requests[node.url] = request
+    return request
+
+def _releaserequest(request):
+    """
+    Removes the XSAMS document of the last request from a Request instance returned
+    by _getrequest, so that it is not kept in memory as long as the instance is reused.
+    """
+    request.xml = None
 
+@_cached()
+def getspecies(node, request = None):
+    """
+    Requests all species of the database node and returns a result.Result instance
+    (see Request.getspecies). Results are cached without the XSAMS document (see _cached): results
+    of repeated calls do not contain it (result.Xml is None). The cache is cleared with
+    getspecies.cache_clear().
+
+    :param node: nodes.Node instance or a string which identifies the node
+    :param request: Request instance which is used for the request. By default a
+                    Request instance is reused for each node.
+    """
+    pooled = request is None
+    if pooled:
+        request = _getrequest(node)
+    try:
+        result = request.getspecies()
+    finally:
+        if pooled:
+            _releaserequest(request)
+
+    return result
+
+def _getspeciesnumber(speciesid):
+    """
+    Returns the numerical id of a specie, e.g. 149 for 'XCDMS-149' or 149
+    """
+    if isinstance(speciesid, basestring):
+        # remove the database prefix (e.g. XCDMS-)
+        speciesid = speciesid.rpartition('-')[2]
+    return int(speciesid)
+
+@_cached(normalize = {'speciesid':_getspeciesnumber})
+def gettransitions(node, speciesid, request = None):
+    """
+    Requests the radiative transitions of one specie from the database node and returns
+    a result.Result instance. Results are cached without the XSAMS document (see _cached): results
+    of repeated calls do not contain it (result.Xml is None). The cache is cleared with
+    gettransitions.cache_clear().
+
+    :param node: nodes.Node instance or a string which identifies the node
+    :param speciesid: Id of the specie, e.g. 149 or 'XCDMS-149'
+    :param request: Request instance which is used for the request. By default a
+                    Request instance is reused for each node.
+    """
+    querystring = "SELECT RadiativeTransitions WHERE SpeciesID=%d" % _getspeciesnumber(speciesid)
+    pooled = request is None
+    if pooled:
+        request = _getrequest(node)
+    request.setquery(querystring)
+    try:
+        result = request.dorequest()
+    finally:
+        if pooled:
+            _releaserequest(request)
+
+    return result
+
+def gettransitions_many(node, speciesids, threads = MAX_CONNECTIONS):
+    """
+    Requests the radiative transitions of several species from the same database node. The
+    requests are performed concurrently by a pool of 'threads' threads.
+    Returns a dictionary with the species ids as keys and the result.Result instances as values.
+
+    :param node: nodes.Node instance or a string which identifies the node
+    :param speciesids: list of ids of the species
+    :param int threads: Number of requests which are performed at the same time
+    """
+    node = _resolvenode(node)
+
+    pool = ThreadPool(threads)
+    try:
+        results = pool.map(lambda speciesid: gettransitions(node, speciesid), speciesids)
+    finally:
+        pool.close()
+        pool.join()
+
+    return dict(zip(speciesids, results))
+
+def gettransitions_batch(node, speciesids, chunksize = 100, request = None):
+    """
+    Requests the radiative transitions of several species from the same database node. Instead
+    of one request per specie, one request (SELECT ... WHERE SpeciesID IN (...)) is sent for each
+    'chunksize' species.
+    Returns a dictionary with the SpeciesID (as specified in the XSAMS document, e.g. 'XCDMS-149')
+    as key and a result.Result instance as value, which contains the specie, its states and its
+    radiative transitions (see result.Result.get_results_by_species).
+
+    :param node: nodes.Node instance or a string which identifies the node
+    :param speciesids: list of ids of the species
+    :param int chunksize: Maximum number of species in one request
+    :param request: Request instance which is used for the requests. By default a
+                    Request instance is reused for each node.
+    """
+    ids = [str(_getspeciesnumber(speciesid)) for speciesid in speciesids]
+
+    results = {}
+    pooled = request is None
+    if pooled:
+        request = _getrequest(node)
+    for i in range(0, len(ids), chunksize):
+        querystring = "SELECT RadiativeTransitions WHERE SpeciesID IN (%s)" % ",".join(ids[i:i+chunksize])
+        request.setquery(querystring)
+        try:
+            result = request.dorequest()
+        finally:
+            if pooled:
+                _releaserequest(request)
+        if result is not None:
+            results.update(result.get_results_by_species())
+
+    return results
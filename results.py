@@ -9,8 +9,16 @@ try:
     is_available_xml_objectify = True
 except ImportError:
     is_available_xml_objectify = False
- 
-from xml.etree import ElementTree
+
+# lxml.etree is preferred to parse XSAMS documents because it is considerably
+# faster than xml.etree and needs less memory. Both provide the same API.
+try:
+    from lxml import etree as ElementTree
+    is_available_lxml = True
+except ImportError:
+    from xml.etree import ElementTree
+    is_available_lxml = False
+
 import urllib2
 from specmodel import *
 import query as q
@@ -18,9 +26,139 @@ import query as q
 from urlparse import urlparse
 
 from dateutil.parser import parse
+import sys
+import threading
+import Queue
 
 XSD = "http://vamdc.org/xml/xsams/1.0"
 
+# Options of the lxml parsers used for XSAMS documents: whitespace between elements is
+# dropped, no id table is built and neither entities nor external resources are loaded.
+PARSER_OPTIONS = {'remove_blank_text':True,
+                  'resolve_entities':False,
+                  'no_network':True,
+                  'huge_tree':True}
+
+# lxml serializes parsing with a shared parser instance, therefore each thread gets its own parsers
+_parsers = threading.local()
+
+def _getparser():
+    """
+    Returns the lxml parser for XSAMS documents of the current thread
+    """
+    if not hasattr(_parsers, 'etree'):
+        _parsers.etree = ElementTree.XMLParser(collect_ids = False, **PARSER_OPTIONS)
+    return _parsers.etree
+
+def _getobjectifyparser():
+    """
+    Returns the lxml.objectify parser for XSAMS documents of the current thread
+    """
+    if not hasattr(_parsers, 'objectify'):
+        _parsers.objectify = objectify.makeparser(collect_ids = False, **PARSER_OPTIONS)
+    return _parsers.objectify
+
+def parse_xsams(xml):
+    """
+    Parses the XSAMS document xml (string) and returns its root element. 
+    """
+    if is_available_lxml:
+        return ElementTree.fromstring(xml, _getparser())
+    else:
+        return ElementTree.fromstring(xml)
+
+# Number of bytes which are read at once from a response
+BLOCKSIZE = 65536
+
+def _readchunks(source, chunks, stop):
+    """
+    Reads the file-like object source in blocks of BLOCKSIZE bytes and puts them into the queue chunks.
+    None is put into the queue at the end of the document and exceptions are passed on via the queue
+    (as tuple returned by sys.exc_info). Reading is stopped as soon as the event stop is set.
+    """
+    try:
+        while not stop.is_set():
+            chunk = source.read(BLOCKSIZE)
+            if not chunk:
+                break
+            chunks.put(chunk)
+        chunks.put(None)
+    except Exception:
+        if not stop.is_set():
+            chunks.put(sys.exc_info())
+
+def _clearqueue(chunks):
+    """
+    Removes all chunks from the queue chunks, a reader which waits for free slots can continue.
+    """
+    try:
+        while True:
+            chunks.get_nowait()
+    except Queue.Empty:
+        pass
+
+def _pullparse(source):
+    """
+    Generator which yields the events of the XSAMS document which is read from source. The document is
+    read by a separate thread, so that the next part of the document is received while the previous
+    part is parsed and processed. If parsing is aborted, source is closed and the reader is stopped
+    before the generator exits.
+    """
+    chunks = Queue.Queue(maxsize = 64)
+    stop = threading.Event()
+    reader = threading.Thread(target = _readchunks, args = (source, chunks, stop))
+    reader.daemon = True
+    reader.start()
+
+    # Queue.get without timeout can not be interrupted (KeyboardInterrupt), but a timeout makes it
+    # poll. KeyboardInterrupt is only raised in the main thread, other threads wait without timeout.
+    if isinstance(threading.current_thread(), threading._MainThread):
+        timeout = 0.5
+    else:
+        timeout = None
+
+    parser = ElementTree.XMLPullParser(events = ('end',), tag = STREAM_TAGS.keys(), **PARSER_OPTIONS)
+    try:
+        while True:
+            try:
+                chunk = chunks.get(timeout = timeout)
+            except Queue.Empty:
+                continue
+            if chunk is None:
+                break
+            if isinstance(chunk, tuple):
+                # re-raise the exception of the reader with its traceback
+                raise chunk[0], chunk[1], chunk[2]
+            parser.feed(chunk)
+            for event in parser.read_events():
+                yield event
+        parser.close()
+        for event in parser.read_events():
+            yield event
+        reader.join()
+    finally:
+        stop.set()
+        if reader.is_alive():
+            # Parsing has been aborted: the source is closed and the reader has to finish before
+            # the connection of the response is closed or reused.
+            source.close()
+            while reader.is_alive():
+                _clearqueue(chunks)
+                reader.join(0.5)
+        _clearqueue(chunks)
+
+def iterparse_xsams(source):
+    """
+    Returns an iterator over the 'end' - events of the elements of the XSAMS document which is 
+    read from the file-like object source. With lxml only events for the elements which are
+    evaluated by specmodel.populate_models_from_events are created and the document
+    is read by a separate thread while it is parsed.
+    """
+    if is_available_lxml:
+        return _pullparse(source)
+    else:
+        return ElementTree.iterparse(source, events = ('end',))
+
 class Result(object):
     """
     An Result instance contains the data returned by querying a VAMDC database node (XSAMS - Document).
@@ -61,10 +199,10 @@ class Result(object):
             return
         
         try:
-            self.root = objectify.XML(self.Xml)
+            self.root = objectify.XML(self.Xml, _getobjectifyparser())
         except ValueError:
             self.Xml=etree.tostring(self.Xml)
-            self.root = objectify.XML(self.Xml)
+            self.root = objectify.XML(self.Xml, _getobjectifyparser())
         except Exception, e:
             print "Objectify error: %s " % e
 
@@ -75,11 +213,29 @@ class Result(object):
         """
 
         if not hasattr(self, 'root') or self.root == None:
-            self.root = ElementTree.fromstring(self.Xml)
+            self.root = parse_xsams(self.Xml)
         #    self.objectify()
 
         self.data = populate_models(self.root, add_states=True)
 
+    def parse_stream(self, events):
+        """
+        Populates classes of specmodel from an iterator of parser events (see iterparse_xsams).
+        The document is not kept in memory, therefore Xml and root are not available afterwards.
+        """
+        self.data = populate_models_from_events(events, add_states=True)
+
+    def discard_xml(self):
+        """
+        Removes the XSAMS document (Xml, root) and the references of the models in data to
+        its elements, so that only the parsed data is kept in memory. The elements are also
+        removed from models which are shared with other results, however, their documents
+        (Xml, root) are kept.
+        """
+        self.Xml = None
+        self.root = None
+        if hasattr(self, 'data'):
+            release_xml(self.data)
 
     def get_vibstates(self):
 
@@ -99,8 +255,65 @@ class Result(object):
                     
         return vibs
 
+    def get_transitions_by_species(self):
+        """
+        Returns the radiative transitions grouped by specie: a dictionary with the SpeciesID
+        as key and a dictionary of the transitions of this specie (transition id as key) as value.
+        """
+        transitions = {}
+        for id in self.data['RadiativeTransitions']:
+            trans = self.data['RadiativeTransitions'][id]
+            speciesid = getattr(trans, 'SpeciesID', None)
+            try:
+                transitions[speciesid][id] = trans
+            except KeyError:
+                transitions[speciesid] = {id:trans}
+
+        return transitions
+
+    def get_results_by_species(self):
+        """
+        Splits the data by specie: returns a dictionary with the SpeciesID as key and a Result instance
+        as value, which contains the atom or molecule, its states and its radiative transitions. Sources
+        and collisional transitions are not split and are available in the results of all species.
+        """
+        results = {}
+
+        def getresult(speciesid):
+            try:
+                return results[speciesid]
+            except KeyError:
+                result = Result(source = self.Source)
+                result.data = dict(self.data)
+                for name in ('Atoms', 'Molecules', 'RadiativeTransitions'):
+                    result.data[name] = self.data[name].__class__(None)
+                result.data['States'] = {}
+                results[speciesid] = result
+                return result
+
+        for name in ('Atoms', 'Molecules'):
+            for speciesid in self.data[name]:
+                getresult(speciesid).data[name][speciesid] = self.data[name][speciesid]
+        for id in self.data['States']:
+            state = self.data['States'][id]
+            getresult(state.SpeciesID).data['States'][id] = state
+        for id in self.data['RadiativeTransitions']:
+            trans = self.data['RadiativeTransitions'][id]
+            getresult(getattr(trans, 'SpeciesID', None)).data['RadiativeTransitions'][id] = trans
+
+        return results
+
+    def __checkdocument(self):
+        """
+        Raises a ValueError if the XSAMS document is not available, because it has been
+        parsed as stream (see parse_stream) or removed (see discard_xml).
+        """
+        if self.Xml is None and getattr(self, 'root', None) is None:
+            raise ValueError("XSAMS document is not available (see Result.parse_stream, Result.discard_xml)")
+
     def get_process_class(self):
 
+        self.__checkdocument()
         classes = {}
         for trans in self.root.Processes.Radiative.RadiativeTransition:
             codes = []
@@ -116,6 +329,7 @@ class Result(object):
     
     def validate(self):
 
+        self.__checkdocument()
         if not hasattr(self, 'xsd'):
             self.xsd=etree.XMLSchema(etree.parse(XSD))
         xml = etree.fromstring(self.Xml)
@@ -12,3 +12,8 @@ DATABASE_FILE = "/srv/www/static/cdms/cdms_lite.db"
 #DATABASE_FILE = "/var/www/static/cdms/cdms_lite/cdms_lite_private.db"
 # Timeout for queries
 TIMEOUT = 600
+# Maximum number of connections to one database node. This is also the default number
+# of requests which are performed at the same time by request.gettransitions_many
+MAX_CONNECTIONS = 10
+# Directory where responses of the database nodes are cached (Request(cache = True))
+CACHE_DIR = "~/.cache/vamdclib"
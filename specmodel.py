@@ -471,19 +471,73 @@ def populate_models(xml, add_states=False):
             #print e
             pass
     if add_states and 'States' not in data.keys():
-        data['States'] = {}
-        for SpeciesID in data['Molecules']:
-            for state in data['Molecules'][SpeciesID].States:
-                state.SpeciesID = SpeciesID
-                data['States'][state.StateID] = state
-
-        for SpeciesID in data['Atoms']:
-            for state in data['Atoms'][SpeciesID].States:
-                state.SpeciesID = SpeciesID
-                data['States'][state.StateID] = state
+        add_states_to_data(data)
             
     return data
-    
+
+def add_states_to_data(data):
+    """
+    Collects the states of all molecules and atoms in data['States']
+    """
+    data['States'] = {}
+    for SpeciesID in data['Molecules']:
+        for state in data['Molecules'][SpeciesID].States:
+            state.SpeciesID = SpeciesID
+            data['States'][state.StateID] = state
+
+    for SpeciesID in data['Atoms']:
+        for state in data['Atoms'][SpeciesID].States:
+            state.SpeciesID = SpeciesID
+            data['States'][state.StateID] = state
+
+def get_stream_tags():
+    """
+    Returns a dictionary which maps the tag of the elements the dictionary classes are
+    built of (e.g. Molecule) to the dictionary class and to the model class of this element.
+    The tags are derived from the paths in DICT_MODELS['dict_types'].
+    """
+    tags = {}
+    for item in DICT_MODELS['dict_types']:
+        path = item['Dictionary'][item['Name']].split("\\")[0]
+        tag = path.split(".")[-1][:-2]
+        tags[intern(NS + tag)] = (item['Name'], eval(item['Type']))
+
+    return tags
+
+STREAM_TAGS = get_stream_tags()
+
+def populate_models_from_events(events, add_states=False):
+    """
+    Populates the models from an iterator of (event, element) - tuples as returned by iterparse.
+    Only 'end' - events are evaluated. Elements are added to the model as soon as they have been
+    parsed and are cleared afterwards, so that the document never has to be kept in memory.
+    """
+    data = {}
+    for item in DICT_MODELS['dict_types']:
+        data[item['Name']] = eval("%s(None)" % item['Name'])
+
+    for event, el in events:
+        try:
+            name, model_class = STREAM_TAGS[el.tag]
+        except KeyError:
+            continue
+
+        try:
+            element = model_class(el)
+            data[name][element.Id] = element
+        except Exception:
+            pass
+
+        el.clear()
+        # lxml only: remove the already processed elements from their parent
+        if hasattr(el, 'getprevious'):
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+
+    if add_states:
+        add_states_to_data(data)
+
+    return data
     
 def calculate_partitionfunction(states, temperature = 300.0):
 
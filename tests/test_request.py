@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of request.Request against a local http server which returns generated XSAMS documents.
+"""
+import os
+import sys
+import re
+import threading
+import unittest
+import urllib
+import BaseHTTPServer
+import SocketServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import request
+import nodes
+
+NS = "http://vamdc.org/xml/xsams/1.0"
+
+def xsams(speciesids, padding = 0):
+    """
+    Returns an XSAMS document with one molecule, one state and one radiative transition
+    for each specie. padding: number of lines of a comment which is added to each molecule
+    """
+    doc = ['<?xml version="1.0"?>\n<XSAMSData xmlns="%s"><Species><Molecules>' % NS]
+    for id in speciesids:
+        doc.append('<Molecule speciesID="XCDMS-%d"><MolecularChemicalSpecies>'
+                   '<StoichiometricFormula>M%d</StoichiometricFormula><Comment>%s</Comment>'
+                   '</MolecularChemicalSpecies><MolecularState stateID="S%d"/></Molecule>' % (id, id, "comment\n" * padding, id))
+    doc.append('</Molecules></Species><Processes><Radiative>')
+    for id in speciesids:
+        doc.append('<RadiativeTransition id="P%d"><SpeciesRef>XCDMS-%d</SpeciesRef>'
+                   '<LowerStateRef>S%d</LowerStateRef><UpperStateRef>S%d</UpperStateRef>'
+                   '</RadiativeTransition>' % (id, id, id, id))
+    doc.append('</Radiative></Processes></XSAMSData>')
+    return "".join(doc)
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Returns the document for the species in the query. The behaviour is set via server.options:
+
+    garble: number of following responses whose body is garbled after the first bytes
+    truncate: number of following responses whose body is cut off after the first bytes
+    rejectpost: POST requests are rejected with status 400
+    maxurl: GET requests with longer urls are rejected with status 414
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def document(self, querypath):
+        self.server.log.append(self.command)
+        match = re.search(r"SpeciesID\s*(?:=|IN\s*\()\s*([0-9, ]+)", urllib.unquote_plus(querypath))
+        if match is None:
+            speciesids = [1]
+        else:
+            speciesids = [int(id) for id in match.group(1).split(",") if id.strip()]
+
+        options = self.server.options
+        if options.get('garble', 0) > 0:
+            options['garble'] -= 1
+            body = xsams(speciesids, padding = 2 * 1024 * 1024)
+            self.reply(200, body[:200] + "<<garbled>>" + body[211:])
+        elif options.get('truncate', 0) > 0:
+            options['truncate'] -= 1
+            body = xsams(speciesids)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:200])
+            self.close_connection = 1
+        else:
+            self.reply(200, xsams(speciesids))
+
+    def do_GET(self):
+        if self.server.options.get('maxurl') and len(self.path) > self.server.options['maxurl']:
+            self.server.log.append(self.command)
+            self.reply(414, "Request-URI Too Long")
+        else:
+            self.document(self.path.partition("?")[2])
+
+    def do_POST(self):
+        querypath = self.rfile.read(int(self.headers.getheader("Content-Length", 0)))
+        if self.server.options.get('rejectpost'):
+            self.server.log.append(self.command)
+            self.reply(400, "Bad Request")
+        else:
+            self.document(querypath)
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients close aborted responses before they have been sent completely
+        pass
+
+class ServerTestCase(unittest.TestCase):
+    """
+    Starts a local server for each test. Tests are run with the httplib backend and, if the
+    package is available, with the requests backend.
+    """
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.options = {}
+        self.server.log = []
+        thread = threading.Thread(target = self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.is_available_requests = request.is_available_requests
+
+    def tearDown(self):
+        request.is_available_requests = self.is_available_requests
+        self.server.shutdown()
+        self.server.server_close()
+
+    def backends(self):
+        """
+        Yields the names of the available backends, the backend is set before each iteration
+        """
+        request.is_available_requests = False
+        yield 'httplib'
+        if self.is_available_requests:
+            request.is_available_requests = True
+            yield 'requests'
+
+    def getrequest(self, query):
+        req = request.Request()
+        req.setbaseurl("http://127.0.0.1:%d/tap/" % self.server.server_address[1])
+        req.setquery(query)
+        return req
+
+class TestAbortedResponse(ServerTestCase):
+    """
+    A response whose body has not been read completely must not be read by the next request
+    """
+    def test_stream(self):
+        for backend in self.backends():
+            self.server.options['garble'] = 1
+            req = self.getrequest("SELECT RadiativeTransitions WHERE SpeciesID=1")
+            self.assertRaises(Exception, req.dorequest, timeout = 10, stream = True)
+
+            req.setquery("SELECT RadiativeTransitions WHERE SpeciesID=2")
+            result = req.dorequest(timeout = 10, stream = True)
+            self.assertEqual(result.data['Molecules'].keys(), ['XCDMS-2'], backend)
+
+    def test_buffered(self):
+        for backend in self.backends():
+            self.server.options['truncate'] = 1
+            req = self.getrequest("SELECT RadiativeTransitions WHERE SpeciesID=1")
+            self.assertRaises(Exception, req.dorequest, timeout = 10)
+
+            req.setquery("SELECT RadiativeTransitions WHERE SpeciesID=2")
+            result = req.dorequest(timeout = 10)
+            self.assertEqual(result.data['Molecules'].keys(), ['XCDMS-2'], backend)
+
+class TestMethodFallback(ServerTestCase):
+    """
+    Requests which are rejected are retried once with the other http-method
+    """
+    # SpeciesID IN (1,...,619): the querypath is longer than 2048 but shorter than MAX_GET_LENGTH
+    QUERY = "SELECT RadiativeTransitions WHERE SpeciesID IN (%s)" % ",".join(str(id) for id in range(1, 620))
+
+    def test_post_to_get(self):
+        for backend in self.backends():
+            self.server.options['rejectpost'] = True
+            req = self.getrequest("SELECT RadiativeTransitions WHERE SpeciesID=2")
+            result = req.dorequest(timeout = 10)
+            self.assertEqual(result.data['Molecules'].keys(), ['XCDMS-2'], backend)
+            self.assertEqual(self.server.log, ['POST', 'GET'], backend)
+            del self.server.log[:]
+
+    def test_get_to_post(self):
+        for backend in self.backends():
+            self.server.options['maxurl'] = 2048
+            req = self.getrequest(self.QUERY)
+            result = req.dorequest(timeout = 10, HttpMethod = 'GET', stream = True)
+            self.assertEqual(len(result.data['Molecules']), 619, backend)
+            self.assertEqual(self.server.log, ['GET', 'POST'], backend)
+            del self.server.log[:]
+
+    def test_no_loop(self):
+        for backend in self.backends():
+            # POST and long urls are both rejected
+            self.server.options['rejectpost'] = True
+            self.server.options['maxurl'] = 2048
+            req = self.getrequest(self.QUERY)
+            self.assertTrue(len(req.querypath) <= request.MAX_GET_LENGTH)
+            self.assertEqual(req.dorequest(timeout = 10), None, backend)
+            self.assertEqual(self.server.log, ['POST', 'GET'], backend)
+            del self.server.log[:]
+
+    def test_arguments(self):
+        # timeout and stream are passed on to the retried request
+        calls = []
+        dorequest = request.Request.dorequest
+        def spy(req, *args, **kwargs):
+            calls.append((kwargs.get('timeout'), kwargs.get('stream')))
+            return dorequest(req, *args, **kwargs)
+
+        self.server.options['rejectpost'] = True
+        req = self.getrequest("SELECT RadiativeTransitions WHERE SpeciesID=2")
+        request.Request.dorequest = spy
+        try:
+            req.dorequest(timeout = 7, stream = True)
+        finally:
+            request.Request.dorequest = dorequest
+        self.assertEqual(calls, [(7, True), (7, True)])
+
+class TestCachedResults(ServerTestCase):
+    """
+    Results of the module functions are cached per node and specie
+    """
+    def setUp(self):
+        ServerTestCase.setUp(self)
+        self.node = nodes.Node('local', url = "http://127.0.0.1:%d/tap/" % self.server.server_address[1],
+                               identifier = 'ivo://local')
+        request.gettransitions.cache_clear()
+
+    def tearDown(self):
+        request.gettransitions.cache_clear()
+        ServerTestCase.tearDown(self)
+
+    def test_species(self):
+        result = request.gettransitions(self.node, 5)
+        self.assertEqual(result.data['Molecules'].keys(), ['XCDMS-5'])
+        self.assertTrue(request.gettransitions(self.node, 'XCDMS-5').data is result.data)
+        self.assertTrue(request.gettransitions(self.node, speciesid = 5).data is result.data)
+        self.assertEqual(len(self.server.log), 1)
+
+        result = request.gettransitions(self.node, speciesid = 6)
+        self.assertEqual(result.data['Molecules'].keys(), ['XCDMS-6'])
+        self.assertEqual(len(self.server.log), 2)
+
+    def test_document(self):
+        # only the first result contains the document, the cache stores the parsed data
+        result = request.gettransitions(self.node, 7)
+        self.assertTrue(result.Xml is not None)
+        cached = request.gettransitions(self.node, 7)
+        self.assertTrue(cached.Xml is None)
+        self.assertTrue(cached.data is result.data)
+        self.assertRaises(ValueError, cached.validate)
+
+if __name__ == '__main__':
+    unittest.main()